@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+"""Convert a directory of graphs into a few memory-mapped files (see
+`gnn_tracking_hpo.packed`).
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from pathlib import Path
+
+from gnn_tracking.utils.loading import TrackingDataset
+
+from gnn_tracking_hpo.packed import pack_graphs
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--sector", type=int, default=None)
+    args = parser.parse_args()
+    ds = TrackingDataset(args.input_dir, sector=args.sector)
+    pack_graphs((ds[i] for i in range(len(ds))), args.output_dir, sector=args.sector)
@@ -9,11 +9,11 @@ from functools import partial
 from typing import Any
 
 import optuna
-from rt_stoppers_contrib import NoImprovementTrialStopper
 
 from gnn_tracking_hpo.cli import add_ec_restore_options
 from gnn_tracking_hpo.config import auto_suggest_if_not_fixed, get_metadata
 from gnn_tracking_hpo.defaults import suggest_default_values
+from gnn_tracking_hpo.stoppers import EWMANoImprovementTrialStopper
 from gnn_tracking_hpo.trainable import ECTrainable
 from gnn_tracking_hpo.tune import Dispatcher, add_common_options
 from gnn_tracking_hpo.util.dict import pop
@@ -86,9 +86,10 @@ def suggest_config(
 
 
 class MyDispatcher(Dispatcher):
-    def get_no_improvement_stopper(self) -> NoImprovementTrialStopper:
-        return NoImprovementTrialStopper(
+    def get_no_improvement_stopper(self) -> EWMANoImprovementTrialStopper:
+        return EWMANoImprovementTrialStopper(
             metric=self.metric,
+            alpha=self.ewma_alpha,
             patience=10,
             mode="max",
             grace_period=0,
@@ -70,16 +70,11 @@ def get_trainable(test=False):
 def main(
     *,
     test=False,
-    gpu=False,
+    cpu=False,
     enqueue: None | list[str] = None,
 ):
     """ """
     maybe_run_wandb_offline()
-    parser = ArgumentParser()
-    add_test_option(parser)
-    add_cpu_option(parser)
-    add_enqueue_option(parser)
-
     maybe_run_distributed()
 
     points_to_evaluate = get_points_to_evaluate(enqueue)
@@ -95,7 +90,7 @@ def main(
     tuner = ray.tune.Tuner(
         ray.tune.with_resources(
             get_trainable(test),
-            {"gpu": 1 if gpu else 0, "cpu": 6 if not test else 1},
+            {"gpu": 1 if not cpu else 0, "cpu": 6 if not test else 1},
         ),
         run_config=air.RunConfig(
             name="pbt_test",
@@ -128,4 +123,8 @@ def main(
 
 
 if __name__ == "__main__":
-    main()
+    parser = ArgumentParser()
+    add_test_option(parser)
+    add_cpu_option(parser)
+    add_enqueue_option(parser)
+    main(**vars(parser.parse_args()))
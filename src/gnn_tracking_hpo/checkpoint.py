@@ -0,0 +1,102 @@
+"""Saving checkpoints without stalling the training loop"""
+
+from __future__ import annotations
+
+import copy
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import torch
+from torch import Tensor
+
+from gnn_tracking_hpo.util.log import logger
+
+
+def _snapshot(obj: Any) -> Any:
+    """Copy all tensors to the CPU (and everything else to new objects), so that
+    the snapshot is not affected by training continuing.
+    """
+    if isinstance(obj, Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(_snapshot(v) for v in obj)
+    return copy.deepcopy(obj)
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_all(snapshots: dict[Path, Any], fsync_executor: ThreadPoolExecutor) -> None:
+    # Write to temporary files first, so that an incomplete checkpoint is never
+    # picked up
+    renames: list[tuple[Path, Path]] = []
+    for path, obj in snapshots.items():
+        tmp_path = path.with_name(path.name + ".tmp")
+        torch.save(obj, tmp_path)
+        renames.append((tmp_path, path))
+    # Flushing the files one after the other is much slower on network file
+    # systems
+    list(fsync_executor.map(_fsync, [tmp_path for tmp_path, _ in renames]))
+    for tmp_path, path in renames:
+        os.replace(tmp_path, path)
+        logger.debug("Finished writing checkpoint %s", path)
+
+
+def _write_all_unless_removed(
+    snapshots: dict[Path, Any], fsync_executor: ThreadPoolExecutor
+) -> None:
+    try:
+        _write_all(snapshots, fsync_executor)
+    except (OSError, RuntimeError):
+        # torch.save raises a RuntimeError if the directory does not exist
+        if all(path.parent.is_dir() for path in snapshots):
+            raise
+        # Ray considers the checkpoint complete as soon as save_checkpoint
+        # returns, so it might already have deleted it again (e.g., because it
+        # has the worst score of all checkpoints that are kept).
+        logger.debug(
+            "Checkpoint directory of %s was removed before writing finished",
+            list(snapshots),
+        )
+
+
+class AsyncCheckpointWriter:
+    def __init__(self):
+        """Write checkpoints on a background thread.
+
+        At most one checkpoint is written at a time: Saving a new checkpoint
+        waits for the previous one to be finished. All files of a checkpoint are
+        flushed to disk (in parallel) before they are moved into place.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._fsync_executor = ThreadPoolExecutor(max_workers=8)
+        self._future: Future | None = None
+
+    def wait(self) -> None:
+        """Block until the last checkpoint has been written"""
+        if self._future is not None:
+            self._future.result()
+            self._future = None
+
+    def save(self, objs: dict[os.PathLike | str, Any]) -> None:
+        """Save checkpoint in the background.
+
+        Args:
+            objs: Objects to save with `torch.save`, keyed by the path of the file
+                that they are saved to. The objects are snapshotted immediately
+                and then written on the background thread.
+        """
+        self.wait()
+        snapshots = {Path(path): _snapshot(obj) for path, obj in objs.items()}
+        self._future = self._executor.submit(
+            _write_all_unless_removed, snapshots, self._fsync_executor
+        )
@@ -38,7 +38,7 @@ def add_enqueue_option(parser: ArgumentParser) -> None:
 
 
 def add_wandb_options(parser: ArgumentParser) -> None:
-    """To be used as a decorator. Add command line options for wandb metadata."""
+    """Add command line options for wandb metadata."""
 
     parser.add_argument("--tags", nargs="+", help="Tags for wandb")
     parser.add_argument(
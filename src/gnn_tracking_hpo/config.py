@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import json
 import pprint
 from os import PathLike
@@ -24,13 +25,20 @@ def auto_suggest_if_not_fixed(
     function.
 
     **Important**: It matters whether the argument types are ints or floats!
+
+    Values that are fixed by a single argument are written to ``config`` in place
+    (``config`` is never copied). Suggested values are only recorded in
+    ``trial.params``.
+
+    Returns:
+        The fixed or suggested value
     """
     if key in config:
         logger.debug("Already fixed %s to %s", key, config[key])
-        return
+        return config[key]
     if key in trial.params:
-        logger.debug("Already fixed %s to %s", key, config[key])
-        return
+        logger.debug("Already fixed %s to %s", key, trial.params[key])
+        return trial.params[key]
     if len(args) == 2:
         if all(isinstance(x, int) for x in args):
             return trial.suggest_int(key, *args, **kwargs)
@@ -69,11 +77,20 @@ def read_json(path: PathLike | str) -> dict[str, Any]:
     return config
 
 
+@functools.lru_cache(maxsize=1)
+def _get_commit_hashes() -> tuple[str, str]:
+    """Commit hashes of gnn_tracking and of this package. Cached, because they
+    do not change during a run.
+    """
+    return get_commit_hash(gnn_tracking), get_commit_hash(Path(__file__).parent)
+
+
 def get_metadata(*, test=False):
+    gnn_tracking_hash, gnn_tracking_experiments_hash = _get_commit_hashes()
     return {
         "test": test,
-        "gnn_tracking_hash": get_commit_hash(gnn_tracking),
-        "gnn_tracking_experiments_hash": get_commit_hash(Path(__file__).parent),
+        "gnn_tracking_hash": gnn_tracking_hash,
+        "gnn_tracking_experiments_hash": gnn_tracking_experiments_hash,
     }
 
 
@@ -100,7 +117,11 @@ def get_points_to_evaluate(
         else:
             raise ValueError("Decoding of json file failed")
     if points_to_evaluate:
-        logger.info("Enqueued trials:\n%s", pprint.pformat(points_to_evaluate))
+        logger.info(
+            "Enqueued %d trials:\n%s",
+            len(points_to_evaluate),
+            pprint.pformat(points_to_evaluate),
+        )
     return points_to_evaluate
 
 
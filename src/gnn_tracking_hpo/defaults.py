@@ -73,6 +73,9 @@ def suggest_default_values(
     d("sector", None)
     d("batch_size", 1)
     d("_val_batch_size", 1)
+    d("_prefetch_factor", 4)
+    d("_prebatch", False)
+    d("_cuda_prefetch", True)
 
     if hc != "none":
         d("repulsive_radius_threshold", 10.0)
@@ -99,6 +102,8 @@ def suggest_default_values(
         d("focal_alpha", 0.25)
         d("focal_gamma", 2.0)
 
+    d("precision", "fp32")
+
     # Optimizers
     d("lr", 5e-4)
     d("optimizer", "adam")
@@ -4,15 +4,48 @@
 from __future__ import annotations
 
 import os
+from typing import Any, Iterator, Sequence
 
+import numpy as np
+import ray
+import torch
 from gnn_tracking.utils.loading import TrackingDataset
-from gnn_tracking.utils.loading import get_loaders as _get_loaders
-from torch.utils.data import random_split
+from torch import Tensor
+from torch.utils.data import ConcatDataset
+from torch.utils.data import DataLoader as TorchDataLoader
+from torch.utils.data import Dataset, RandomSampler, Subset
+from torch_geometric.data import Batch, Data
 from torch_geometric.loader import DataLoader
 
+from gnn_tracking_hpo.packed import PackedGraphs, is_packed
 from gnn_tracking_hpo.util.log import logger
 
 
+def get_dataset(
+    dirs: os.PathLike | str | list[os.PathLike] | list[str],
+    *,
+    stop: int | None = None,
+    sector: int | None = None,
+) -> Sequence[Data]:
+    """Get graphs from directories. If all directories contain packed graphs (see
+    `gnn_tracking_hpo.packed`), they are memory-mapped, otherwise they are loaded
+    with `TrackingDataset`.
+
+    Args:
+        dirs: Directories containing the graphs
+        stop: Maximum number of graphs
+        sector: Only load specific sector
+    """
+    dir_list = [dirs] if isinstance(dirs, (str, os.PathLike)) else dirs
+    if not all(is_packed(d) for d in dir_list):
+        return TrackingDataset(dirs, stop=stop, sector=sector)
+    logger.debug("Loading packed graphs")
+    ds = ConcatDataset([PackedGraphs(d, sector=sector) for d in dir_list])
+    if stop is not None:
+        return Subset(ds, range(min(stop, len(ds))))  # type: ignore
+    return ds  # type: ignore
+
+
 def get_graphs_split(
     *,
     train_size: int,
@@ -20,6 +53,7 @@ def get_graphs_split(
     input_dirs: list[os.PathLike] | list[str],
     sector: int | None = None,
     test=False,
+    seed=0,
 ) -> dict[str, list]:
     """Load graphs for training, testing, and validation from one directory.
 
@@ -29,6 +63,8 @@ def get_graphs_split(
         input_dirs: Directory containing the graphs
         sector: Only load specific sector
         test:
+        seed: Random seed for splitting. The split is the same for all trials
+            that use the same seed.
 
     Returns:
         Training and validation graphs as dictionary
@@ -45,25 +81,27 @@ def get_graphs_split(
         logger.debug(
             "For test graphs only one graph is loaded and used for train/test/val"
         )
-        ds = TrackingDataset(input_dirs, stop=1, sector=sector)
+        ds = get_dataset(input_dirs, stop=1, sector=sector)
         return {
             "train": ds,
             "val": ds,
             "test": ds,
         }
 
-    ds = TrackingDataset(
+    ds = get_dataset(
         input_dirs,
         stop=train_size + val_size,
         sector=sector,
     )
-    train_ds, val_ds = random_split(
-        ds,
-        (train_size, val_size),
-    )
+    if len(ds) < train_size + val_size:
+        raise ValueError(
+            f"Requested {train_size} training and {val_size} validation graphs, "
+            f"but only {len(ds)} graphs were found in {input_dirs}"
+        )
+    idx = np.random.default_rng(seed).permutation(len(ds)).tolist()
     return {
-        "train": train_ds,
-        "val": val_ds,
+        "train": Subset(ds, idx[:train_size]),
+        "val": Subset(ds, idx[train_size : train_size + val_size]),
         "test": [],
     }
 
@@ -94,12 +132,12 @@ def get_graphs_separate(
     assert train_size >= 1 or train_size == 0
     assert val_size >= 1 or val_size == 0
 
-    train_graphs = TrackingDataset(
+    train_graphs = get_dataset(
         train_dirs,
         stop=train_size,
         sector=sector,
     )
-    val_graphs = TrackingDataset(
+    val_graphs = get_dataset(
         val_dirs,
         stop=val_size,
         sector=sector,
@@ -107,23 +145,296 @@ def get_graphs_separate(
     return {"train": train_graphs, "val": val_graphs, "test": []}
 
 
+# Config keys that determine which graphs are loaded
+GRAPH_CONFIG_KEYS = (
+    "train_data_dir",
+    "val_data_dir",
+    "n_graphs_train",
+    "n_graphs_val",
+    "sector",
+    "test",
+)
+
+
+def get_graph_config(config: dict[str, Any]) -> dict[str, Any]:
+    """Extract all values that determine which graphs are loaded from a config"""
+    return {key: config.get(key) for key in GRAPH_CONFIG_KEYS}
+
+
+def get_graphs(config: dict[str, Any]) -> dict[str, list]:
+    """Load graphs as specified by the config of a trainable.
+
+    Args:
+        config: Trainable config, see `GRAPH_CONFIG_KEYS` for the relevant keys
+
+    Returns:
+        Training, validation and test graphs as dictionary
+    """
+    if config["val_data_dir"]:
+        return get_graphs_separate(
+            train_size=config["n_graphs_train"],
+            val_size=config["n_graphs_val"],
+            sector=config["sector"],
+            test=config["test"],
+            train_dirs=config["train_data_dir"],
+            val_dirs=config["val_data_dir"],
+        )
+    return get_graphs_split(
+        train_size=config["n_graphs_train"],
+        val_size=config["n_graphs_val"],
+        sector=config["sector"],
+        test=config["test"],
+        input_dirs=config["train_data_dir"],
+    )
+
+
+def _as_list(graphs: Sequence[Data]) -> list[Data]:
+    """Return graphs as list without copying them if they already are one"""
+    if isinstance(graphs, list):
+        return graphs
+    return [graphs[i] for i in range(len(graphs))]
+
+
+@ray.remote(num_gpus=0, num_returns=3)
+def _load_remote(config: dict[str, Any]) -> tuple[list, list, list]:
+    """Load graphs in a separate ray task"""
+    graph_dct = get_graphs(config)
+    # The datasets only load the graphs lazily, so we have to materialize them
+    # before they are put into the object store
+    return tuple(  # type: ignore
+        _as_list(graphs)
+        for graphs in (graph_dct["train"], graph_dct["val"], graph_dct["test"])
+    )
+
+
+def load_and_share_graphs(
+    config: dict[str, Any], num_cpus: int = 1
+) -> dict[str, ray.ObjectRef]:
+    """Load graphs once and put them into the ray object store, so that all trials
+    can share them instead of reading them from disk again.
+
+    The graphs are loaded by a CPU-only ray task, so that no GPU is blocked while
+    loading.
+
+    Args:
+        config: Trainable config, see `GRAPH_CONFIG_KEYS` for the relevant keys
+        num_cpus: Number of CPUs to reserve for the loading task
+
+    Returns:
+        Dictionary of object references to the lists of training, validation, and
+        test graphs
+    """
+    refs = _load_remote.options(num_cpus=num_cpus).remote(config)
+    return dict(zip(["train", "val", "test"], refs))
+
+
+def slice_batch(batch: Batch, start: int, stop: int) -> Batch:
+    """Get graphs ``start`` to ``stop`` of a batch as a new batch by slicing the
+    tensors of the batch rather than collating the individual graphs again.
+    """
+    attrs: dict[str, Any] = {}
+    slice_dict: dict[str, Any] = {}
+    inc_dict: dict[str, Any] = {}
+    for key, value in batch:
+        if key in ("batch", "ptr"):
+            continue
+        slices = batch._slice_dict[key]
+        incs = batch._inc_dict[key]
+        lo = int(slices[start])
+        hi = int(slices[stop])
+        if isinstance(value, Tensor):
+            dim = batch.__cat_dim__(key, value)
+            value = value.narrow(dim, lo, hi - lo)
+            if isinstance(incs, Tensor):
+                if incs.dim() > 1 or int(incs[start]) != 0:
+                    value = value - incs[start]
+                incs = incs[start:stop] - incs[start]
+        else:
+            value = value[start:stop]
+        attrs[key] = value
+        slice_dict[key] = slices[start : stop + 1] - lo
+        inc_dict[key] = incs
+    ptr = batch.ptr[start : stop + 1]
+    out = Batch(
+        _base_cls=batch.__class__,
+        batch=batch.batch[int(ptr[0]) : int(ptr[-1])] - start,
+        ptr=ptr - ptr[0],
+        **attrs,
+    )
+    out._num_graphs = stop - start
+    out._slice_dict = slice_dict
+    out._inc_dict = inc_dict
+    return out
+
+
+class PreBatchedGraphs(Dataset):
+    def __init__(self, graphs: list[Data], batch_size=1):
+        """Dataset of batches that are sliced from a single batch of all graphs.
+
+        All graphs are collated only once, so that getting a batch only takes
+        views of contiguous ranges of the node and edge tensors. Note that every
+        batch always consists of the same consecutive graphs, only the order of
+        the batches changes between epochs.
+
+        Args:
+            graphs: Graphs to collate
+            batch_size: Number of graphs per batch
+        """
+        self._batch = Batch.from_data_list(_as_list(graphs))
+        if torch.cuda.is_available():
+            self._batch = self._batch.pin_memory()
+        self._batch_size = batch_size
+        self._n_graphs = self._batch.num_graphs
+
+    def __len__(self) -> int:
+        return -(-self._n_graphs // self._batch_size)
+
+    def __getitem__(self, idx: int) -> Batch:
+        start = idx * self._batch_size
+        stop = min(start + self._batch_size, self._n_graphs)
+        return slice_batch(self._batch, start, stop)
+
+
 def get_loaders(
-    graph_dct: dict[str, list], batch_size=1, val_batch_size=1, test=False
-) -> dict[str, DataLoader]:
+    graph_dct: dict[str, list],
+    batch_size=1,
+    val_batch_size=1,
+    test=False,
+    prefetch_factor=4,
+    prebatch=False,
+    num_workers: int | None = None,
+    pin_memory: bool | None = None,
+) -> dict[str, DataLoader | TorchDataLoader]:
     """Get data loaders
 
+    All graphs are loaded into memory first. Workers are kept alive between
+    epochs and batches can be put into pinned memory, so that they can be copied
+    to the GPU asynchronously. Note that this only helps if the batches are moved
+    with ``.to(device, non_blocking=True)`` (see `CudaPrefetcher`).
+
     Args:
-        graph_dct:
-        batch_size:
-        test:
+        graph_dct: Dictionary of training, validation, and test graphs
+        batch_size: Batch size for training
+        val_batch_size: Batch size for validation and testing
+        test: Test mode (only use one worker and one training batch per epoch)
+        prefetch_factor: Number of batches loaded in advance by each worker
+        prebatch: Collate all graphs once and slice batches from them (see
+            `PreBatchedGraphs`) rather than collating every batch separately
+        num_workers: Maximum number of workers per loader. Defaults to 6 (1 in
+            test mode). Training and validation loaders do not run at the same
+            time, so this should be the number of CPUs available.
+        pin_memory: Put batches into pinned memory. Should be set if and only if
+            the model is trained on a CUDA device. Defaults to whether CUDA is
+            available.
 
     Returns:
         Dictionary of data loaders
     """
-    return _get_loaders(
-        graph_dct,
-        batch_size=batch_size,
-        other_batch_size=val_batch_size,
-        cpus=6 if not test else 1,
-        max_sample_size=12000 if not test else 1,
-    )
+    if num_workers is None:
+        num_workers = 6 if not test else 1
+    # Narrowing the type of num_workers does not carry over to nested functions
+    max_workers: int = num_workers
+    pin = torch.cuda.is_available() if pin_memory is None else pin_memory
+    max_sample_size = 12000 if not test else 1
+    # The datasets load graphs lazily, so without this, every graph would be read
+    # from disk again in every epoch
+    graph_dct = {key: _as_list(graphs) for key, graphs in graph_dct.items()}
+
+    def get_prebatched_loader(key: str) -> TorchDataLoader:
+        dataset = PreBatchedGraphs(
+            graph_dct[key], batch_size=batch_size if key == "train" else val_batch_size
+        )
+        sampler = None
+        if key == "train":
+            n_batches = -(-max_sample_size // batch_size)
+            sampler = RandomSampler(dataset, num_samples=min(n_batches, len(dataset)))
+        # Slicing is cheap, so we do not need any workers. batch_size=None
+        # disables automatic batching because our items are already batches.
+        return TorchDataLoader(
+            dataset, batch_size=None, sampler=sampler, pin_memory=pin
+        )
+
+    def get_loader(key: str) -> DataLoader | TorchDataLoader:
+        dataset = graph_dct[key]
+        if prebatch and len(dataset):
+            return get_prebatched_loader(key)
+        n_workers = min(len(dataset), max_workers)
+        params: dict[str, Any] = {
+            "batch_size": batch_size if key == "train" else val_batch_size,
+            "num_workers": n_workers,
+            "pin_memory": pin,
+        }
+        if n_workers > 0:
+            # Workers are reused across epochs and validation rounds
+            params["persistent_workers"] = True
+            params["prefetch_factor"] = prefetch_factor
+        if key == "train" and len(dataset):
+            params["sampler"] = RandomSampler(
+                dataset, num_samples=min(max_sample_size, len(dataset))
+            )
+        else:
+            params["shuffle"] = False
+        return DataLoader(dataset, **params)
+
+    return {key: get_loader(key) for key in graph_dct}
+
+
+def assert_pinned(data: Data) -> None:
+    """Assert that all tensors of a batch are in pinned memory. Otherwise,
+    ``.to(device, non_blocking=True)`` will silently be synchronous.
+    """
+    for key, value in data:
+        if isinstance(value, Tensor):
+            assert value.is_pinned(), f"Tensor {key} is not in pinned memory"
+
+
+class CudaPrefetcher:
+    def __init__(self, loader: TorchDataLoader, device: torch.device):
+        """Wrap a data loader, so that the next batch is copied to the GPU on a
+        separate CUDA stream while the current batch is being processed.
+
+        Args:
+            loader: Data loader (must use pinned memory, otherwise the copies
+                are synchronous)
+            device: CUDA device
+        """
+        self.loader = loader
+        self.device = device
+        self.stream = torch.cuda.Stream(device=device)
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "loader":
+            raise AttributeError(name)
+        return getattr(self.loader, name)
+
+    def _preload(self, batch: Data) -> Data:
+        with torch.cuda.stream(self.stream):
+            return batch.to(self.device, non_blocking=True)
+
+    def _wait(self, batch: Data) -> Data:
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(self.stream)
+        # Make sure that the memory is not reused by the copy stream while
+        # the batch is still in use
+        for _, value in batch:
+            if isinstance(value, Tensor):
+                value.record_stream(current_stream)
+        return batch
+
+    def __iter__(self) -> Iterator[Data]:
+        batches = iter(self.loader)
+        try:
+            first = next(batches)
+        except StopIteration:
+            return
+        # Checking the first batch of each epoch is cheap enough
+        assert_pinned(first)
+        upcoming = self._preload(first)
+        for batch in batches:
+            current = self._wait(upcoming)
+            upcoming = self._preload(batch)
+            yield current
+        yield self._wait(upcoming)
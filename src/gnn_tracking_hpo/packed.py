@@ -0,0 +1,154 @@
+"""Storing many graphs in a few memory-mapped files rather than one file per graph.
+
+A packed directory contains one raw binary file per attribute of the graphs (all
+graphs concatenated), an ``offsets.npz`` file with the start index of every graph
+in each of these files, and an ``index.json`` file describing them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+import torch
+from torch import Tensor
+from torch_geometric.data import Data
+
+from gnn_tracking_hpo.util.log import logger
+
+INDEX_NAME = "index.json"
+OFFSETS_NAME = "offsets.npz"
+
+
+def is_packed(directory: os.PathLike | str) -> bool:
+    """Is this a directory of packed graphs?"""
+    return (Path(directory) / INDEX_NAME).is_file()
+
+
+def pack_graphs(
+    graphs: Iterable[Data],
+    output_dir: os.PathLike | str,
+    *,
+    sector: int | None = None,
+) -> None:
+    """Write graphs into a packed directory.
+
+    The graphs are streamed, i.e., they do not need to fit into memory at the
+    same time.
+
+    Args:
+        graphs: Graphs to pack. All graphs must have the same attributes.
+        output_dir: Output directory
+        sector: Sector of the graphs (only recorded to check it when loading)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files: dict[str, Any] = {}
+    tensor_info: dict[str, dict[str, Any]] = {}
+    sizes: dict[str, list[int]] = {}
+    other: dict[str, list[Any]] = {}
+    n_graphs = 0
+    try:
+        for data in graphs:
+            for key, value in data:
+                if not isinstance(value, Tensor):
+                    other.setdefault(key, []).append(value)
+                    continue
+                value = value.detach().cpu()
+                scalar = value.dim() == 0
+                if scalar:
+                    cat_dim = 0
+                    array = value.reshape(1).numpy()
+                else:
+                    cat_dim = data.__cat_dim__(key, value) % value.dim()
+                    # Concatenation dimension first, so that graphs can be appended
+                    array = np.moveaxis(value.numpy(), cat_dim, 0)
+                if key not in files:
+                    files[key] = (output_dir / f"{key}.dat").open("wb")
+                    tensor_info[key] = {
+                        "dtype": array.dtype.str,
+                        "cat_dim": cat_dim,
+                        "scalar": scalar,
+                        "shape": list(array.shape[1:]),
+                    }
+                    sizes[key] = []
+                files[key].write(np.ascontiguousarray(array).tobytes())
+                sizes[key].append(array.shape[0])
+            n_graphs += 1
+    finally:
+        for f in files.values():
+            f.close()
+    if any(len(s) != n_graphs for s in sizes.values()):
+        raise ValueError("All graphs must have the same attributes")
+    np.savez(
+        output_dir / OFFSETS_NAME,
+        **{key: np.concatenate([[0], np.cumsum(s)]) for key, s in sizes.items()},
+    )
+    index = {
+        "n_graphs": n_graphs,
+        "sector": sector,
+        "tensors": tensor_info,
+        "other": other,
+    }
+    (output_dir / INDEX_NAME).write_text(json.dumps(index))
+    logger.info("Packed %d graphs into %s", n_graphs, output_dir)
+
+
+class PackedGraphs(Sequence[Data]):
+    def __init__(self, directory: os.PathLike | str, *, sector: int | None = None):
+        """Graphs from a packed directory (see `pack_graphs`).
+
+        All files are memory-mapped and graphs are only built when accessed. Their
+        tensors are views of the memory-mapped files.
+
+        Args:
+            directory: Packed directory
+            sector: Sector that the graphs should belong to
+        """
+        directory = Path(directory)
+        index = json.loads((directory / INDEX_NAME).read_text())
+        if sector is not None and index["sector"] != sector:
+            raise ValueError(
+                f"{directory} contains graphs of sector {index['sector']}, not {sector}"
+            )
+        self._n_graphs: int = index["n_graphs"]
+        self._tensor_info: dict[str, dict[str, Any]] = index["tensors"]
+        self._other: dict[str, list[Any]] = index["other"]
+        with np.load(directory / OFFSETS_NAME) as offsets:
+            self._offsets = {key: offsets[key] for key in self._tensor_info}
+        self._arrays = {}
+        for key, info in self._tensor_info.items():
+            shape = (int(self._offsets[key][-1]), *info["shape"])
+            if shape[0] == 0:
+                # Empty files cannot be memory-mapped
+                self._arrays[key] = np.empty(shape, dtype=np.dtype(info["dtype"]))
+                continue
+            # Copy-on-write, so that torch does not complain about read-only
+            # memory
+            self._arrays[key] = np.memmap(
+                directory / f"{key}.dat",
+                dtype=np.dtype(info["dtype"]),
+                mode="c",
+                shape=shape,
+            )
+
+    def __len__(self) -> int:
+        return self._n_graphs
+
+    def __getitem__(self, idx: int) -> Data:  # type: ignore[override]
+        if idx < 0:
+            idx += self._n_graphs
+        if not 0 <= idx < self._n_graphs:
+            raise IndexError(idx)
+        attrs: dict[str, Any] = {}
+        for key, info in self._tensor_info.items():
+            offsets = self._offsets[key]
+            array = self._arrays[key][offsets[idx] : offsets[idx + 1]]
+            value = torch.from_numpy(np.moveaxis(array, 0, info["cat_dim"]))
+            attrs[key] = value.reshape(()) if info["scalar"] else value
+        for key, values in self._other.items():
+            attrs[key] = values[idx]
+        return Data(**attrs)
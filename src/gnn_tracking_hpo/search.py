@@ -0,0 +1,161 @@
+"""Search algorithms"""
+
+from __future__ import annotations
+
+import pickle
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, cast
+
+import optuna
+from ray.tune.search.optuna import OptunaSearch
+
+from gnn_tracking_hpo.util.log import logger
+
+
+class RDBOptunaSearch(OptunaSearch):
+    def __init__(
+        self,
+        *args,
+        storage: str | None = None,
+        study_name: str = "optuna",
+        pruner: optuna.pruners.BasePruner | None = None,
+        prefetch: int = 0,
+        num_samples: int = -1,
+        **kwargs,
+    ):
+        """Like `OptunaSearch`, but can keep the optuna study in a database rather
+        than in memory and can prune trials with an optuna pruner (see
+        `gnn_tracking_hpo.stoppers.OptunaPruningStopper`).
+
+        Args:
+            *args: Passed on to `OptunaSearch`
+            storage: Database URL (e.g., ``sqlite:///tune.db``). If None, the study
+                is kept in memory.
+            study_name: Name of the study. If a study of that name already exists
+                in the storage, it is resumed.
+            pruner: Optuna pruner. The intermediate values that it uses are the
+                metric values reported by the trials.
+            prefetch: Number of optuna trials to ask for on a background thread
+                whenever a trial completes, so that sampling new parameters does
+                not block the next `suggest`. Should not be larger than the number
+                of concurrent trials, else the sampler gets less feedback.
+            num_samples: Total number of trials that will be suggested (-1:
+                infinite). No trials are prefetched beyond this number.
+            **kwargs: Passed on to `OptunaSearch`
+        """
+        self._rdb_storage = storage
+        self._rdb_study_name = study_name
+        self._pruner = pruner
+        # IDs of trials that were pruned but are not completed yet
+        self._pruned_trials: set[str] = set()
+        self._prefetch = prefetch
+        self._num_samples = num_samples
+        self._num_suggested = 0
+        self._prefetched: deque[Future] = deque()
+        # Created on first use, see `_get_ask_executor`
+        self._ask_executor: ThreadPoolExecutor | None = None
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Neither the executor nor the futures can be pickled. Prefetched trials
+        # are not restored, but simply asked for again.
+        state = self.__dict__.copy()
+        state["_ask_executor"] = None
+        state["_prefetched"] = deque()
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+
+    @property
+    def _study(self) -> optuna.Study:
+        # OptunaSearch only sets the study in _setup_study
+        assert self._ot_study is not None
+        return cast(optuna.Study, self._ot_study)
+
+    def _setup_study(self, mode):
+        super()._setup_study(mode)
+        if self._rdb_storage is None and self._pruner is None:
+            return
+        in_memory_study = self._ot_study
+        if self._rdb_storage is not None:
+            logger.info(
+                "Using optuna study %s from %s",
+                self._rdb_study_name,
+                self._rdb_storage,
+            )
+        self._ot_study = optuna.create_study(
+            storage=self._rdb_storage,
+            sampler=in_memory_study.sampler,
+            pruner=self._pruner or in_memory_study.pruner,
+            study_name=self._rdb_study_name,
+            directions=in_memory_study.directions,
+            load_if_exists=True,
+        )
+        for point in self._points_to_evaluate:
+            self._ot_study.enqueue_trial(point, skip_if_exists=True)
+
+    def should_prune(self, trial_id: str) -> bool:
+        """Should the trial be pruned based on the values it reported so far?"""
+        ot_trial = self._ot_trials.get(trial_id)
+        if ot_trial is None or not ot_trial.should_prune():
+            return False
+        self._pruned_trials.add(trial_id)
+        return True
+
+    def suggest(self, trial_id: str):
+        if trial_id not in self._ot_trials:
+            self._num_suggested += 1
+            if callable(self._space) and self._prefetched:
+                # OptunaSearch only asks for a new trial if there is none for
+                # this ID
+                self._ot_trials[trial_id] = self._prefetched.popleft().result()
+        return super().suggest(trial_id)
+
+    def on_trial_complete(self, trial_id: str, result=None, error=False) -> None:
+        if trial_id not in self._pruned_trials:
+            super().on_trial_complete(trial_id, result=result, error=error)
+        else:
+            # Mark the trial as pruned rather than completed, so that the sampler
+            # can tell them apart
+            self._pruned_trials.remove(trial_id)
+            ot_trial = self._ot_trials.pop(trial_id)
+            self._study.tell(ot_trial, state=optuna.trial.TrialState.PRUNED)
+        self._prefetch_trials()
+
+    def save(self, checkpoint_path: str) -> None:
+        # OptunaSearch.save pickles self.__dict__ directly, bypassing
+        # __getstate__. Its restore updates __dict__ with the saved dict.
+        with open(checkpoint_path, "wb") as f:
+            pickle.dump(self.__getstate__(), f)
+
+    def close(self) -> None:
+        """Mark all prefetched trials that were not suggested as failed, so that
+        they are not left running in the study. To be called once tuning has
+        finished.
+        """
+        while self._prefetched:
+            ot_trial = self._prefetched.popleft().result()
+            self._study.tell(ot_trial, state=optuna.trial.TrialState.FAIL)
+        if self._ask_executor is not None:
+            self._ask_executor.shutdown()
+            self._ask_executor = None
+
+    def _get_ask_executor(self) -> ThreadPoolExecutor:
+        if self._ask_executor is None:
+            self._ask_executor = ThreadPoolExecutor(max_workers=1)
+        return self._ask_executor
+
+    def _prefetch_trials(self) -> None:
+        """Ask for new trials in the background, taking into account all results
+        so far.
+        """
+        if not callable(self._space):
+            return
+        n_prefetch = self._prefetch
+        if self._num_samples >= 0:
+            # Trials that will never be suggested would remain running forever
+            n_prefetch = min(n_prefetch, self._num_samples - self._num_suggested)
+        while len(self._prefetched) < n_prefetch:
+            self._prefetched.append(self._get_ask_executor().submit(self._study.ask))
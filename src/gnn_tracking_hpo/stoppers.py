@@ -0,0 +1,62 @@
+"""Stoppers for ray tune"""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from ray.tune import Stopper
+from rt_stoppers_contrib import NoImprovementTrialStopper
+
+from gnn_tracking_hpo.search import RDBOptunaSearch
+from gnn_tracking_hpo.util.log import logger
+
+
+class EWMANoImprovementTrialStopper(NoImprovementTrialStopper):
+    def __init__(self, metric: str, *, alpha: float = 0.3, **kwargs):
+        """Like `NoImprovementTrialStopper`, but operates on an exponentially
+        weighted moving average of the metric, so that noise does not reset the
+        patience.
+
+        Args:
+            metric: Metric to monitor
+            alpha: Smoothing factor. 1 corresponds to the raw metric.
+            **kwargs: Passed on to `NoImprovementTrialStopper`
+        """
+        super().__init__(metric, **kwargs)
+        self._ewma_metric = metric
+        self._alpha = alpha
+        self._ewma: dict[str, float] = {}
+
+    def __call__(self, trial_id: Any, result: dict[str, Any]) -> bool:
+        value = result.get(self._ewma_metric)
+        if value is None or math.isnan(value):
+            return super().__call__(trial_id, result)
+        previous = self._ewma.get(trial_id)
+        if previous is not None:
+            value = self._alpha * value + (1 - self._alpha) * previous
+        self._ewma[trial_id] = value
+        return super().__call__(trial_id, {**result, self._ewma_metric: value})
+
+
+class OptunaPruningStopper(Stopper):
+    def __init__(self, searcher: RDBOptunaSearch):
+        """Stop trials that are pruned by the pruner of the optuna study of the
+        searcher.
+
+        Ray Tune evaluates stoppers before passing the result on to the searcher,
+        so the decision is based on all but the latest result.
+
+        Args:
+            searcher: Searcher holding the optuna study
+        """
+        self._searcher = searcher
+
+    def __call__(self, trial_id: Any, result: dict[str, Any]) -> bool:
+        if self._searcher.should_prune(trial_id):
+            logger.info("Stopping trial %s: Pruned by optuna", trial_id)
+            return True
+        return False
+
+    def stop_all(self) -> bool:
+        return False
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import logging
+import os
 from abc import ABC
-from functools import partial
+from functools import partial, wraps
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
+import numpy as np
+import ray
 import tabulate
+import torch
 from gnn_tracking.metrics.losses import (
     BackgroundLoss,
     EdgeWeightFocalLoss,
@@ -25,15 +29,56 @@ from ray import tune
 from torch import nn
 from torch.optim import SGD, Adam, lr_scheduler
 
+from gnn_tracking_hpo.checkpoint import AsyncCheckpointWriter
 from gnn_tracking_hpo.cluster_scans import reduced_dbscan_scan
 from gnn_tracking_hpo.defaults import legacy_config_compatibility
-from gnn_tracking_hpo.load import get_graphs_separate, get_graphs_split, get_loaders
+from gnn_tracking_hpo.load import (
+    CudaPrefetcher,
+    get_graph_config,
+    get_graphs,
+    get_loaders,
+)
 from gnn_tracking_hpo.restore import restore_model
 from gnn_tracking_hpo.slurmcontrol import SlurmControl, get_slurm_job_id
 from gnn_tracking_hpo.util.log import logger
 from gnn_tracking_hpo.util.paths import find_checkpoint, get_config
 
 
+def _to_float32(obj: Any) -> Any:
+    if isinstance(obj, torch.Tensor) and obj.dtype == torch.bfloat16:
+        return obj.float()
+    if isinstance(obj, dict):
+        return {k: _to_float32(v) for k, v in obj.items()}
+    return obj
+
+
+def _to_python(obj: Any) -> Any:
+    """Convert scalar tensors and numpy scalars to plain python numbers, so that
+    the loggers do not have to handle (and possibly synchronize on) them.
+    """
+    if isinstance(obj, torch.Tensor) and obj.numel() == 1:
+        return obj.item()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {k: _to_python(v) for k, v in obj.items()}
+    return obj
+
+
+def autocast_bf16(forward: Callable, device_type: str) -> Callable:
+    """Run forward pass with bf16 autocasting, but return float32 outputs, so that
+    the loss functions are still evaluated in full precision.
+    """
+
+    @wraps(forward)
+    def wrapped(*args, **kwargs):
+        with torch.autocast(device_type=device_type, dtype=torch.bfloat16):
+            out = forward(*args, **kwargs)
+        return _to_float32(out)
+
+    return wrapped
+
+
 class HPOTrainable(tune.Trainable, ABC):
     """Add additional 'restore' capabilities to tune.Trainable."""
 
@@ -85,11 +130,39 @@ class DefaultTrainable(HPOTrainable):
 
     # This is set explicitly by the Dispatcher class
     dispatcher_id: int = 0
+    # Write checkpoints on a background thread. Set by the Dispatcher class.
+    async_checkpoint: bool = False
+    # Compile the forward pass of the model. Set by the Dispatcher class.
+    compile_model: bool = False
+    # Number of training batches per step (None: full epoch). Set by the
+    # Dispatcher class.
+    batches_per_step: int | None = None
+    # Stops the trial when the metric does not improve anymore. Set by the
+    # Dispatcher class.
+    no_improvement_stopper: Callable[[str, dict[str, Any]], bool] | None = None
+    # Number of CPUs of each trial, used for the data loader workers. Set by the
+    # Dispatcher class.
+    cpus_per_trial: int | None = None
 
     # Do not add blank self.tc or self.trainer to __init__, because it will be called
     # after setup when setting ``reuse_actor == True`` and overwriting your values
     # from set
-    def setup(self, config: dict[str, Any]):
+    def setup(
+        self,
+        config: dict[str, Any],
+        graph_refs: dict[str, ray.ObjectRef] | None = None,
+        graph_config: dict[str, Any] | None = None,
+    ):
+        """Set up trainer.
+
+        Args:
+            config: Trainable config
+            graph_refs: Object references to graphs that were loaded by the
+                dispatcher (see `gnn_tracking_hpo.load.load_and_share_graphs`)
+            graph_config: Config values with which the graphs from ``graph_refs``
+                were loaded. If they do not match our config, the graphs are
+                loaded from disk instead.
+        """
         config = legacy_config_compatibility(config)
         if sji := get_slurm_job_id():
             logger.info("I'm running on a node with job ID=%s", sji)
@@ -108,10 +181,34 @@ class DefaultTrainable(HPOTrainable):
         )
         logger.debug("Got config\n%s", config_table)
         self.tc = config
+        self._graph_refs = graph_refs
+        self._shared_graph_config = graph_config
+        # Graphs from ``graph_refs``, fetched on first use
+        self._shared_graphs: dict[str, Any] | None = None
+        self._checkpoint_writer = AsyncCheckpointWriter()
+        # Loaders of the previous trial and the config they were built with, so
+        # that they can be reused when the actor is reused
+        self._loaders: dict[str, Any] | None = None
+        self._loader_config: dict[str, Any] | None = None
         fix_seeds()
         self.hook_before_trainer_setup()
         self.trainer = self.get_trainer()
 
+    def reset_config(self, new_config: dict[str, Any]) -> bool:
+        """Start a new trial in this actor (``reuse_actors=True``).
+
+        The trainer (and thereby model and optimizer) is rebuilt from the new
+        config, but the data loaders (and their worker processes) are kept if
+        the new config loads the same data.
+        """
+        self._checkpoint_writer.wait()
+        self.tc = legacy_config_compatibility(new_config)
+        del self.trainer
+        fix_seeds()
+        self.hook_before_trainer_setup()
+        self.trainer = self.get_trainer()
+        return True
+
     def hook_before_trainer_setup(self):
         pass
 
@@ -212,35 +309,57 @@ class DefaultTrainable(HPOTrainable):
         else:
             raise ValueError(f"Unknown optimizer {self.tc['optimizer']}")
 
+    def _get_loader_config(self) -> dict[str, Any]:
+        """All config values that the loaders depend on"""
+        return {
+            **get_graph_config(self.tc),
+            "batch_size": self.tc["batch_size"],
+            "_val_batch_size": self.tc["_val_batch_size"],
+            "_prefetch_factor": self.tc.get("_prefetch_factor", 4),
+            "_prebatch": self.tc.get("_prebatch", False),
+        }
+
+    def get_device(self) -> torch.device:
+        """Device to train on. Can be overridden with the ``GNN_TRACKING_DEVICE``
+        environment variable (set by the dispatcher with ``--cpu``).
+        """
+        if device := os.environ.get("GNN_TRACKING_DEVICE"):
+            return torch.device(device)
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
     def get_loaders(self):
         logger.debug("Getting loaders")
         if self.tc.get("_no_data", False):
             logger.debug("Not adding loaders to trainer")
             return {}
 
-        if self.tc["val_data_dir"]:
-            graph_dict = get_graphs_separate(
-                train_size=self.tc["n_graphs_train"],
-                val_size=self.tc["n_graphs_val"],
-                sector=self.tc["sector"],
-                test=self.tc["test"],
-                train_dirs=self.tc["train_data_dir"],
-                val_dirs=self.tc["val_data_dir"],
-            )
+        loader_config = self._get_loader_config()
+        if self._loaders is not None and loader_config == self._loader_config:
+            logger.debug("Reusing loaders of previous trial")
+            return self._loaders
+        if self._graph_refs is not None and (
+            get_graph_config(self.tc) == self._shared_graph_config
+        ):
+            if self._shared_graphs is None:
+                logger.debug("Getting shared graphs from the object store")
+                self._shared_graphs = {
+                    key: ray.get(ref) for key, ref in self._graph_refs.items()
+                }
+            graph_dict = self._shared_graphs
         else:
-            graph_dict = get_graphs_split(
-                train_size=self.tc["n_graphs_train"],
-                val_size=self.tc["n_graphs_val"],
-                sector=self.tc["sector"],
-                test=self.tc["test"],
-                input_dirs=self.tc["train_data_dir"],
-            )
-        return get_loaders(
+            graph_dict = get_graphs(self.tc)
+        self._loaders = get_loaders(
             graph_dict,
             test=self.tc["test"],
             batch_size=self.tc["batch_size"],
             val_batch_size=self.tc["_val_batch_size"],
+            prefetch_factor=self.tc.get("_prefetch_factor", 4),
+            prebatch=self.tc.get("_prebatch", False),
+            num_workers=self.cpus_per_trial,
+            pin_memory=self.get_device().type == "cuda",
         )
+        self._loader_config = loader_config
+        return self._loaders
 
     def get_trainer(self) -> TCNTrainer:
         test = self.tc.get("test", False)
@@ -252,9 +371,30 @@ class DefaultTrainable(HPOTrainable):
             lr_scheduler=self.get_lr_scheduler(),
             cluster_functions=self.get_cluster_functions(),  # type: ignore
             optimizer=self.get_optimizer(),
+            device=self.get_device(),
         )
         trainer.logger.setLevel(logging.DEBUG)
+        if self.compile_model:
+            logger.info("Compiling model")
+            # Only compiling the forward method keeps the keys of the state dict
+            # unchanged. The number of hits and edges differ between graphs, so
+            # we need dynamic shapes.
+            trainer.model.forward = torch.compile(trainer.model.forward, dynamic=True)
+        if self.tc.get("precision", "fp32") == "bf16":
+            logger.info("Using bf16 autocasting for the forward pass")
+            trainer.model.forward = autocast_bf16(
+                trainer.model.forward, trainer.device.type
+            )
+        elif self.tc.get("precision", "fp32") != "fp32":
+            raise ValueError(f"Unknown precision {self.tc['precision']}")
         trainer.max_batches_for_clustering = 100 if not test else 10
+        if (
+            trainer.device.type == "cuda"
+            and self.tc.get("_cuda_prefetch", True)
+            and not self.tc.get("_no_data", False)
+        ):
+            logger.debug("Prefetching training batches on separate CUDA stream")
+            trainer.train_loader = CudaPrefetcher(trainer.train_loader, trainer.device)
         if self.tc["scheduler"] == "cycliclr":
             logger.info("Setting lr_scheduler_step to batch")
             trainer.lr_scheduler_step = "batch"
@@ -262,20 +402,51 @@ class DefaultTrainable(HPOTrainable):
         return trainer
 
     def step(self):
-        return self.trainer.step(max_batches=None if not self.tc["test"] else 1)
+        max_batches = self.batches_per_step if not self.tc["test"] else 1
+        result = self.trainer.step(max_batches=max_batches)
+        n_batches = len(self.trainer.train_loader)
+        if max_batches is not None:
+            n_batches = min(n_batches, max_batches)
+        result["batches_trained"] = (self.iteration + 1) * n_batches
+        result = _to_python(result)
+        if self.no_improvement_stopper is not None and self.no_improvement_stopper(
+            self.trial_id, result
+        ):
+            logger.info("Stopping trial %s: No improvement", self.trial_id)
+            result["done"] = True
+        return result
 
     def save_checkpoint(
         self,
         checkpoint_dir,
     ):
-        return self.trainer.save_checkpoint(
-            Path(checkpoint_dir) / "checkpoint.pt",
-        )
+        path = Path(checkpoint_dir) / "checkpoint.pt"
+        if self.async_checkpoint:
+            self._checkpoint_writer.save({path: self.get_checkpoint_state()})
+            return None
+        return self.trainer.save_checkpoint(path)
+
+    def get_checkpoint_state(self) -> dict[str, Any]:
+        """State of the trainer as saved by `TCNTrainer.save_checkpoint`, so that
+        it can be loaded with `TCNTrainer.load_checkpoint`.
+        """
+        return {
+            "epoch": self.trainer._epoch,
+            "model_state_dict": self.trainer.model.state_dict(),
+            "optimizer_state_dict": self.trainer.optimizer.state_dict(),
+        }
 
     def load_checkpoint(self, checkpoint_path, **kwargs):
+        if Path(checkpoint_path).is_dir():
+            # Ray passes the checkpoint directory, e.g., when resuming paused trials
+            checkpoint_path = Path(checkpoint_path) / "checkpoint.pt"
         logger.debug("Loading checkpoint from %s", checkpoint_path)
+        self._checkpoint_writer.wait()
         self.trainer.load_checkpoint(checkpoint_path, **kwargs)
 
+    def cleanup(self):
+        self._checkpoint_writer.wait()
+
 
 class PretrainedECTCNTrainable(DefaultTrainable):
     @property
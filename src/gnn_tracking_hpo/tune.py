@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import os
 import random
+import shutil
 import sys
+import tempfile
 from argparse import ArgumentParser
 from datetime import datetime
 from functools import cached_property, partial
@@ -11,14 +13,21 @@ from typing import Any, Callable
 
 import optuna
 import pytimeparse
+import ray
+import wandb
 from ray import tune
 from ray.air import CheckpointConfig, FailureConfig, RunConfig
 from ray.air.integrations.wandb import WandbLoggerCallback
 from ray.tune import Callback, ResultGrid, Stopper, SyncConfig, Trainable
-from ray.tune.schedulers import ASHAScheduler
-from ray.tune.search.optuna import OptunaSearch
+from ray.tune.schedulers import ASHAScheduler, HyperBandScheduler, TrialScheduler
+from ray.tune.search import (
+    BasicVariantGenerator,
+    ConcurrencyLimiter,
+    SearchAlgorithm,
+    Searcher,
+)
 from ray.tune.stopper import CombinedStopper, MaximumIterationStopper, TimeoutStopper
-from rt_stoppers_contrib import LoggedStopper, NoImprovementTrialStopper
+from rt_stoppers_contrib import LoggedStopper
 from wandb_osh.ray_hooks import TriggerWandbSyncRayHook
 
 from gnn_tracking_hpo.cli import (
@@ -29,12 +38,20 @@ from gnn_tracking_hpo.cli import (
     add_wandb_options,
 )
 from gnn_tracking_hpo.config import get_points_to_evaluate, read_json
-from gnn_tracking_hpo.orchestrate import (
-    have_internet,
-    maybe_run_distributed,
-    maybe_run_wandb_offline,
+from gnn_tracking_hpo.defaults import legacy_config_compatibility
+from gnn_tracking_hpo.load import (
+    GRAPH_CONFIG_KEYS,
+    get_graph_config,
+    load_and_share_graphs,
+)
+from gnn_tracking_hpo.orchestrate import maybe_run_distributed, maybe_run_wandb_offline
+from gnn_tracking_hpo.search import RDBOptunaSearch
+from gnn_tracking_hpo.stoppers import (
+    EWMANoImprovementTrialStopper,
+    OptunaPruningStopper,
 )
 from gnn_tracking_hpo.util.log import logger
+from gnn_tracking_hpo.util.paths import get_ray_results_dir
 
 
 def add_common_options(parser: ArgumentParser):
@@ -42,11 +59,6 @@ def add_common_options(parser: ArgumentParser):
     add_cpu_option(parser)
     add_enqueue_option(parser)
     add_local_option(parser)
-    parser.add_argument(
-        "--restore",
-        help="Restore previous training search state from this directory",
-        default=None,
-    )
     parser.add_argument(
         "--only-enqueued",
         help="Only run enqueued points, do not tune any parameters",
@@ -87,7 +99,74 @@ def add_common_options(parser: ArgumentParser):
     parser.add_argument(
         "--no-scheduler",
         action="store_true",
-        help="Do not use scheduler, run all trials, only stopping them on plateaus.",
+        help="Do not use scheduler, run all trials, only stopping them when optuna "
+        "prunes them (or on plateaus with --only-enqueued).",
+    )
+    parser.add_argument(
+        "--scheduler",
+        choices=["asha", "hyperband"],
+        default="asha",
+        help="Trial scheduler. asha stops bad trials, hyperband pauses trials at "
+        "every rung and resumes the best ones from their checkpoints.",
+    )
+    parser.add_argument(
+        "--batches-per-step",
+        type=int,
+        default=None,
+        help="Validate and report after this many training batches rather than "
+        "after every epoch. Scheduler and stoppers then count in units of steps.",
+    )
+    parser.add_argument(
+        "--share-graphs",
+        action="store_true",
+        help="Load graphs once and share them between all trials via the ray object "
+        "store. Requires that no graph-related parameters are tuned.",
+    )
+    parser.add_argument(
+        "--optuna-storage",
+        help="Database URL for the optuna study (e.g., for PostgreSQL when running "
+        "with many workers). A study with the same name (--dname) in this database "
+        "is resumed. Defaults to a new SQLite database on node-local storage, "
+        "which can be deleted at the end of the job.",
+    )
+    parser.add_argument(
+        "--ewma-alpha",
+        type=float,
+        default=0.3,
+        help="Smoothing factor of the moving average of the metric that is used "
+        "to stop trials that do not improve (only with --only-enqueued, "
+        "otherwise trials are pruned by optuna). 1 uses the raw metric.",
+    )
+    parser.add_argument(
+        "--gpus-per-trial",
+        type=float,
+        default=1.0,
+        help="Number of GPUs per trial. Use fractions to run several trials on one "
+        "GPU.",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=None,
+        help="Maximum number of concurrent trials. By default, as many trials run "
+        "as fit on the resources of the cluster. Cannot be used with HyperBand.",
+    )
+    parser.add_argument(
+        "--compile",
+        dest="compile_model",
+        action="store_true",
+        help="Compile the model with torch.compile",
+    )
+    parser.add_argument(
+        "--async-ckpt",
+        action="store_true",
+        help="Write checkpoints on a background thread",
+    )
+    parser.add_argument(
+        "--local-dir",
+        help="Write results to this directory (e.g., node-local scratch space) "
+        "rather than to ~/ray_results and copy them to ~/ray_results at the end. "
+        "Requires --local, because only the results on this node are copied.",
     )
     add_wandb_options(parser)
 
@@ -105,6 +184,24 @@ def get_timeout_stopper(timeout: str | None = None) -> Stopper | None:
         return LoggedStopper(TimeoutStopper(timeout_seconds))
 
 
+def get_wandb_settings(stats_interval: float) -> wandb.Settings:
+    """Get wandb settings that sample the system metrics (GPU utilization etc.)
+    every ``stats_interval`` seconds.
+    """
+    # The setting is private and its name depends on the wandb version
+    for key in ["x_stats_sampling_interval", "_stats_sample_rate_seconds"]:
+        kwargs: dict[str, Any] = {key: stats_interval}
+        try:
+            return wandb.Settings(**kwargs)
+        except (TypeError, ValueError):
+            continue
+    logger.warning(
+        "Cannot set the sampling interval of system metrics for wandb %s",
+        wandb.__version__,
+    )
+    return wandb.Settings()
+
+
 def simple_run_without_tune(trainable, suggest_config: Callable) -> None:
     """Simple run without tuning for testing purposes."""
     study = optuna.create_study()
@@ -125,7 +222,6 @@ class Dispatcher:
         # ---- Supplied fom CLI
         test=False,
         cpu=False,
-        restore=None,
         enqueue: None | list[str] = None,
         only_enqueued=False,
         fixed: None | str = None,
@@ -139,28 +235,51 @@ class Dispatcher:
         no_tune=False,
         num_samples: None | int = None,
         no_scheduler=False,
+        scheduler="asha",
+        batches_per_step: int | None = None,
         local=False,
+        share_graphs=False,
+        optuna_storage: str | None = None,
+        ewma_alpha=0.3,
+        gpus_per_trial=1.0,
+        max_concurrent: int | None = None,
+        compile_model=False,
+        async_ckpt=False,
+        local_dir: str | None = None,
         # ----
         grace_period=3,
+        max_t=100,
         no_improvement_patience=10,
         additional_stoppers=None,
+        checkpoint_frequency=1,
+        checkpoint_num_to_keep=5,
+        wandb_stats_interval=60.0,
+        optuna_prefetch=1,
     ):
         """For most arguments, see corresponding command line interface.
 
         Args:
-            grace_period: Grace period for ASHA scheduler.
+            grace_period: Grace period for ASHA scheduler (in steps).
+            max_t: Maximum number of steps per trial for the schedulers
             no_improvement_patience: Number of iterations without improvement before
                 stopping
+            checkpoint_frequency: Save checkpoint every n iterations
+            checkpoint_num_to_keep: Number of checkpoints to keep per trial
+            wandb_stats_interval: Seconds between samples of system metrics
+                (GPU utilization etc.) that are logged to wandb
+            optuna_prefetch: Number of optuna trials to sample in the background
+                after a trial completes (at most the maximum number of concurrent
+                trials, if limited)
         """
         self.test = test
         if cpu:
             os.environ["GNN_TRACKING_DEVICE"] = "cpu"
         self.cpu = cpu
-        self.restore = restore
         self.enqueue = enqueue
         self.only_enqueued = only_enqueued
         self.fixed = fixed
         self.grace_period = grace_period
+        self.max_t = max_t
         self.timeout = timeout
         self.tags = tags
         if not group:
@@ -180,7 +299,41 @@ class Dispatcher:
         self.no_tune = no_tune
         self.num_samples = num_samples
         self.no_scheduler = no_scheduler
+        self.scheduler = scheduler
+        self.batches_per_step = batches_per_step
         self.local = local
+        self.share_graphs = share_graphs
+        self.optuna_storage = optuna_storage
+        self.ewma_alpha = ewma_alpha
+        self.gpus_per_trial = gpus_per_trial
+        if (
+            max_concurrent is not None
+            and scheduler == "hyperband"
+            and not no_scheduler
+            and not only_enqueued
+        ):
+            # See get_search_alg
+            raise ValueError("--max-concurrent cannot be used with HyperBand")
+        self.max_concurrent = max_concurrent
+        self.compile_model = compile_model
+        if async_ckpt and scheduler == "hyperband" and not no_scheduler:
+            # Ray saves paused trials to memory, deleting the checkpoint directory
+            # right away, before the background write is done.
+            raise ValueError("--async-ckpt cannot be used with HyperBand")
+        self.async_ckpt = async_ckpt
+        if local_dir is not None and not local:
+            # Without syncing, the trial directories stay on the worker nodes, so
+            # there would be nothing to copy.
+            raise ValueError("--local-dir can only be used with --local")
+        self.local_dir = local_dir
+        self.checkpoint_frequency = checkpoint_frequency
+        self.checkpoint_num_to_keep = checkpoint_num_to_keep
+        self.wandb_stats_interval = wandb_stats_interval
+        self.optuna_prefetch = optuna_prefetch
+        # Object references to graphs shared between all trials
+        self.graph_refs: dict[str, Any] | None = None
+        # Set by `get_optuna_search`
+        self.optuna_search: RDBOptunaSearch | None = None
         if self.test and not self.dname.endswith("_test"):
             self.dname += "_test"
         if additional_stoppers is None:
@@ -210,15 +363,95 @@ class Dispatcher:
         Returns:
 
         """
-        trainable.dispatcher_id = self.id
+        trainable = self.get_configured_trainable(trainable)
 
         if self.no_tune:
             simple_run_without_tune(trainable, suggest_config)
 
         maybe_run_wandb_offline()
         maybe_run_distributed(local=self.local, **self.get_resources())
+        if self.share_graphs:
+            trainable = self.get_trainable_with_shared_graphs(trainable, suggest_config)
         tuner = self.get_tuner(trainable, suggest_config)
-        return tuner.fit()
+        try:
+            return tuner.fit()
+        finally:
+            if self.optuna_search is not None:
+                self.optuna_search.close()
+            self.copy_results_from_local_dir()
+
+    def get_configured_trainable(self, trainable: type[Trainable]) -> type[Trainable]:
+        """Subclass of the trainable with the settings of the dispatcher as class
+        attributes.
+
+        Setting the attributes on ``trainable`` itself is not enough: Classes that
+        can be imported are sent to the ray actors by reference, so the actors
+        would only see the defaults. The subclass is sent by value.
+        """
+        return type(
+            trainable.__name__,
+            (trainable,),
+            {
+                "dispatcher_id": self.id,
+                "async_checkpoint": self.async_ckpt,
+                "compile_model": self.compile_model,
+                "batches_per_step": self.batches_per_step,
+                "no_improvement_stopper": self.get_no_improvement_stopper(),
+                "cpus_per_trial": int(self.get_trial_resources()["cpu"]),
+            },
+        )
+
+    def copy_results_from_local_dir(self) -> None:
+        """Copy results from ``self.local_dir`` to the default results directory
+        in a single pass at the end of the run. Only the results on this node
+        are copied.
+        """
+        if self.local_dir is None:
+            return
+        source = Path(self.local_dir).expanduser() / self.dname
+        target = get_ray_results_dir() / self.dname
+        if not source.is_dir() or source.resolve() == target.resolve():
+            return
+        logger.info("Copying results from %s to %s", source, target)
+        try:
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        except OSError:
+            # This is called while the tuner exits, so do not mask its result or
+            # its exception
+            logger.exception("Failed to copy results from %s to %s", source, target)
+
+    def get_shared_graph_config(
+        self, suggest_config: Callable
+    ) -> dict[str, Any] | None:
+        """Get the config values that determine which graphs are loaded by
+        sampling a config once. Returns None if any of them are tuned.
+        """
+        trial = optuna.create_study().ask()
+        config = suggest_config(trial, test=self.test, fixed=self.fixed_config)
+        config = legacy_config_compatibility({**config, **trial.params})
+        if tuned := set(trial.params) & set(GRAPH_CONFIG_KEYS):
+            logger.warning(
+                "Cannot share graphs between trials, because %s are tuned", tuned
+            )
+            return None
+        return get_graph_config(config)
+
+    def get_trainable_with_shared_graphs(
+        self, trainable: type[Trainable], suggest_config: Callable
+    ) -> type[Trainable]:
+        """Load graphs once and pass references to them to the trainable."""
+        graph_config = self.get_shared_graph_config(suggest_config)
+        if graph_config is None:
+            return trainable
+        self.graph_refs = load_and_share_graphs(
+            graph_config, num_cpus=self.get_resources()["num_cpus"]
+        )
+        # Only start trials (and thereby block GPUs) once the graphs are available
+        logger.info("Waiting for graphs to be loaded")
+        ray.wait(list(self.graph_refs.values()), num_returns=len(self.graph_refs))
+        return tune.with_parameters(
+            trainable, graph_refs=self.graph_refs, graph_config=graph_config
+        )
 
     def get_resources(self) -> dict[str, int]:
         return {
@@ -226,54 +459,89 @@ class Dispatcher:
             "num_cpus": 6 if not self.test else 1,
         }
 
+    def get_trial_resources(self) -> dict[str, float]:
+        """Resources per trial. When sharing GPUs between trials, the CPUs are
+        shared as well.
+        """
+        resources = self.get_resources()
+        if self.cpu:
+            return {"cpu": resources["num_cpus"], "gpu": 0}
+        return {
+            "cpu": max(1, int(resources["num_cpus"] * min(self.gpus_per_trial, 1))),
+            "gpu": self.gpus_per_trial,
+        }
+
     def get_tuner(
         self, trainable: type[Trainable], suggest_config: Callable
     ) -> tune.Tuner:
+        # The tune config sets up the searcher, which the stoppers may need
+        tune_config = self.get_tune_config(suggest_config)
         return tune.Tuner(
-            tune.with_resources(
-                trainable,
-                {
-                    "cpu": self.get_resources()["num_cpus"],
-                    "gpu": self.get_resources()["num_gpus"],
-                },
-            ),
-            tune_config=self.get_tune_config(suggest_config),
+            tune.with_resources(trainable, self.get_trial_resources()),
+            tune_config=tune_config,
             run_config=self.get_run_config(),
         )
 
-    def get_no_improvement_stopper(self) -> NoImprovementTrialStopper | None:
-        return NoImprovementTrialStopper(
+    def get_no_improvement_stopper(self) -> EWMANoImprovementTrialStopper | None:
+        """Stopper that is evaluated by the trainable itself after every step
+        (rather than by Ray Tune), so that it does not run on the driver.
+
+        By default, this is only used with ``--only-enqueued``, because there is no
+        optuna study then. Otherwise, trials that do not improve are pruned by
+        optuna instead (see `get_optuna_pruner` and `get_pruning_stopper`).
+        Subclasses can override this to use the stopper in addition to pruning.
+        """
+        if not self.only_enqueued:
+            return None
+        return EWMANoImprovementTrialStopper(
             metric=self.metric,
+            alpha=self.ewma_alpha,
             patience=self.no_improvement_patience,
             mode="max",
             grace_period=self.grace_period,
             rel_change_thld=0.005,
         )
 
+    def get_optuna_pruner(self) -> optuna.pruners.BasePruner:
+        return optuna.pruners.PercentilePruner(
+            25.0, n_startup_trials=5, n_warmup_steps=self.grace_period
+        )
+
+    def get_pruning_stopper(self) -> OptunaPruningStopper | None:
+        """Stopper that stops trials pruned by the pruner of the optuna study"""
+        if self.optuna_search is None:
+            return None
+        return OptunaPruningStopper(self.optuna_search)
+
     def get_stoppers(self) -> list[Stopper]:
         # For easier subclassing, methods can be overridden to return None
         # to disable
-        stoppers: list[Stopper] = [
-            self.get_no_improvement_stopper(),
+        stoppers: list[Stopper | None] = [
+            self.get_pruning_stopper(),
             *self.additional_stoppers,
         ]
         if timeout_stopper := get_timeout_stopper(self.timeout):
             stoppers.append(timeout_stopper)
-        if self.test:
+        if self.test and (self.no_scheduler or self.only_enqueued):
+            # Otherwise, the iterations are limited by the scheduler's max_t
             stoppers.append(LoggedStopper(MaximumIterationStopper(1)))
         return [stopper for stopper in stoppers if stopper is not None]
 
     def get_wandb_callbacks(self) -> list[Callback]:
-        callbacks = [
+        callbacks: list[Callback] = [
             WandbLoggerCallback(
                 api_key_file="~/.wandb_api_key",
                 project="gnn_tracking",
                 tags=self.tags,
                 group=self.group,
                 notes=self.note,
+                # Sampling the system metrics too often slows down the logging
+                settings=get_wandb_settings(self.wandb_stats_interval),
             ),
         ]
-        if not have_internet():
+        # Set by maybe_run_wandb_offline, so we do not need to check the internet
+        # connection again
+        if os.environ.get("WANDB_MODE") == "offline":
             callbacks.append(TriggerWandbSyncRayHook())
         return callbacks
 
@@ -283,43 +551,115 @@ class Dispatcher:
             callbacks.extend(self.get_wandb_callbacks())
         return callbacks
 
+    @cached_property
+    def fixed_config(self) -> dict[str, Any] | None:
+        """Config values that are fixed in all trials (read from ``self.fixed``)"""
+        if self.fixed is None:
+            return None
+        return read_json(Path(self.fixed))
+
     @cached_property
     def points_to_evaluate(self) -> list[dict[str, Any]]:
         return get_points_to_evaluate(self.enqueue)
 
     def get_optuna_sampler(self):
-        return None
+        return optuna.samplers.TPESampler(
+            n_startup_trials=10, multivariate=True, group=True
+        )
 
-    def get_optuna_search(self, suggest_config: Callable) -> OptunaSearch:
-        fixed_config: None | dict[str, Any] = None
-        if self.fixed is not None:
-            fixed_config = read_json(Path(self.fixed))
+    def get_optuna_storage(self) -> str | None:
+        """Database URL for the optuna study. If None, the study is kept in memory.
 
-        if self.points_to_evaluate:
-            logger.warning(
-                "Workaround for https://github.com/ray-project/ray/issues/35319"
-            )
-            assert len(self.points_to_evaluate) == 1
-            assert self.only_enqueued
-            assert self.get_num_samples() == 1
-            point = self.points_to_evaluate[0]
-            space = partial(suggest_config, fixed=point, test=self.test)
+        The study is named after ``self.dname``. With ``--optuna-storage``, running
+        with the same name again resumes the previous search.
 
-        else:
-            space = partial(suggest_config, test=self.test, fixed=fixed_config)
+        By default, a new SQLite database on node-local storage (``$TMPDIR``) is
+        used, because SQLite is slow on shared file systems. Its name contains the
+        dispatcher ID, so that it never silently continues an old study. It might
+        be deleted at the end of the job (e.g., on SLURM), so searches that should
+        be resumed need a persistent database URL passed with ``--optuna-storage``.
+        """
+        if self.optuna_storage is not None:
+            return self.optuna_storage
+        if self.test:
+            return None
+        path = Path(tempfile.gettempdir()) / f"{self.dname}_{self.id}.db"
+        logger.warning(
+            "Keeping the optuna study in %s, which might be deleted at the end of "
+            "the job. Use --optuna-storage to be able to resume the search.",
+            path,
+        )
+        return f"sqlite:///{path}"
 
-        optuna_search = OptunaSearch(
+    def get_max_concurrent(self) -> int:
+        """Maximum number of concurrent trials. 0 means no limit (the default).
+
+        The default does not depend on the GPUs of the cluster, because workers
+        can join the cluster after the dispatcher was started.
+        """
+        if self.max_concurrent is not None:
+            return self.max_concurrent
+        return 0
+
+    def get_enqueued_configs(self, suggest_config: Callable) -> list[dict[str, Any]]:
+        """Complete the enqueued points to full configs with ``suggest_config``"""
+        configs = []
+        for point in self.points_to_evaluate:
+            trial = optuna.create_study().ask()
+            config = suggest_config(trial, test=self.test, fixed=point)
+            configs.append({**config, **trial.params})
+        return configs
+
+    def get_search_alg(self, suggest_config: Callable) -> SearchAlgorithm | Searcher:
+        if self.only_enqueued:
+            # No need to fit a sampler if we only run fixed configs
+            return BasicVariantGenerator(
+                points_to_evaluate=self.get_enqueued_configs(suggest_config),
+                max_concurrent=self.get_max_concurrent(),
+            )
+        search_alg: Searcher = self.get_optuna_search(suggest_config)
+        if self.scheduler == "hyperband" and not self.no_scheduler:
+            # Paused trials do not block any resources, but count as running for
+            # the concurrency limiter, which could then block the search.
+            return search_alg
+        if max_concurrent := self.get_max_concurrent():
+            logger.info("Running at most %d concurrent trials", max_concurrent)
+            # Not in batch mode, so that new trials are started as soon as any
+            # trial finishes
+            search_alg = ConcurrencyLimiter(search_alg, max_concurrent=max_concurrent)
+        return search_alg
+
+    def get_optuna_search(self, suggest_config: Callable) -> RDBOptunaSearch:
+        if self.points_to_evaluate:
+            # See https://github.com/ray-project/ray/issues/35319
+            raise ValueError(
+                "Enqueued points are currently only supported with --only-enqueued"
+            )
+        # The search space is only evaluated by the searcher on the driver, so
+        # the fixed config is not sent to the trial actors
+        space = partial(suggest_config, test=self.test, fixed=self.fixed_config)
+        optuna_search = RDBOptunaSearch(
             space,
             metric=self.metric,
             mode="max",
-            points_to_evaluate=self.points_to_evaluate,
             sampler=self.get_optuna_sampler(),
+            storage=self.get_optuna_storage(),
+            study_name=self.dname,
+            pruner=self.get_optuna_pruner(),
+            prefetch=self.get_optuna_prefetch(),
+            num_samples=self.get_num_samples(),
         )
-        if self.restore:
-            logger.info(f"Restoring previous state from {self.restore}")
-            optuna_search.restore_from_dir(self.restore)
+        self.optuna_search = optuna_search
         return optuna_search
 
+    def get_optuna_prefetch(self) -> int:
+        """Number of optuna trials to prefetch, bounded by the maximum number of
+        concurrent trials (if any).
+        """
+        if max_concurrent := self.get_max_concurrent():
+            return min(self.optuna_prefetch, max_concurrent)
+        return self.optuna_prefetch
+
     def get_num_samples(self) -> int:
         """Return number of samples/trials to run"""
         if self.test:
@@ -331,15 +671,34 @@ class Dispatcher:
         logger.warning("No n-samples specified, defaulting to infinity")
         return -1
 
-    def get_scheduler(self) -> None | ASHAScheduler:
-        if self.no_scheduler:
+    def get_scheduler(self) -> None | TrialScheduler:
+        if self.no_scheduler or self.only_enqueued:
             # FIFO scheduler
             return None
-        return ASHAScheduler(
-            metric=self.metric,
-            mode="max",
-            grace_period=self.grace_period,
-        )
+        # With a fixed number of batches per step, count in batches, so that
+        # decisions are comparable between different step sizes
+        time_attr = "training_iteration"
+        unit = 1
+        if self.batches_per_step is not None:
+            time_attr = "batches_trained"
+            unit = self.batches_per_step
+        max_t = self.max_t * unit if not self.test else 1
+        if self.scheduler == "hyperband":
+            return HyperBandScheduler(
+                time_attr=time_attr,
+                metric=self.metric,
+                mode="max",
+                max_t=max_t,
+            )
+        if self.scheduler == "asha":
+            return ASHAScheduler(
+                time_attr=time_attr,
+                metric=self.metric,
+                mode="max",
+                grace_period=min(self.grace_period * unit, max_t),
+                max_t=max_t,
+            )
+        raise ValueError(f"Unknown scheduler {self.scheduler}")
 
     def get_tune_config(
         self,
@@ -348,23 +707,28 @@ class Dispatcher:
         return tune.TuneConfig(
             scheduler=self.get_scheduler(),
             num_samples=self.get_num_samples(),
-            search_alg=self.get_optuna_search(suggest_config),
+            search_alg=self.get_search_alg(suggest_config),
+            # New trials are started in the actors of finished trials, saving
+            # the start up of a new process (and possibly its data loading)
+            reuse_actors=True,
         )
 
     def get_checkpoint_config(self) -> CheckpointConfig:
         return CheckpointConfig(
             checkpoint_score_attribute=self.metric,
             checkpoint_score_order="max",
-            num_to_keep=5,
-            checkpoint_frequency=1,
+            num_to_keep=self.checkpoint_num_to_keep,
+            checkpoint_frequency=self.checkpoint_frequency,
         )
 
     def get_run_config(self) -> RunConfig:
+        stoppers = self.get_stoppers()
         return RunConfig(
             name=self.dname,
+            local_dir=self.local_dir,
             callbacks=self.get_callbacks(),
             sync_config=SyncConfig(syncer=None),
-            stop=CombinedStopper(*self.get_stoppers()),
+            stop=CombinedStopper(*stoppers) if stoppers else None,
             checkpoint_config=self.get_checkpoint_config(),
             log_to_file=True,
             failure_config=FailureConfig(
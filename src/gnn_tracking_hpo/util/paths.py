@@ -11,6 +11,11 @@ from gnn_tracking_hpo.util.log import logger
 _default_base_path = Path("~/ray_results/").expanduser()
 
 
+def get_ray_results_dir() -> Path:
+    """Default directory to which ray writes the results"""
+    return _default_base_path
+
+
 def find_result_dir(project: str, part: str, *, base_path=_default_base_path) -> Path:
     """Find result dir of a trial
 
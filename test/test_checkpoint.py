@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import shutil
+
+import torch
+
+from gnn_tracking_hpo.checkpoint import AsyncCheckpointWriter
+
+
+def test_async_checkpoint_writer(tmp_path):
+    writer = AsyncCheckpointWriter()
+    path = tmp_path / "checkpoint.pt"
+    tensor = torch.zeros(3)
+    writer.save({path: {"tensor": tensor, "epoch": 1}})
+    # Changes after saving do not end up in the checkpoint
+    tensor += 1
+    writer.wait()
+    state = torch.load(path)
+    assert state["epoch"] == 1
+    assert torch.equal(state["tensor"], torch.zeros(3))
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_async_checkpoint_writer_removed_directory(tmp_path):
+    writer = AsyncCheckpointWriter()
+    checkpoint_dir = tmp_path / "checkpoint_000001"
+    checkpoint_dir.mkdir()
+    shutil.rmtree(checkpoint_dir)
+    writer.save({checkpoint_dir / "checkpoint.pt": {"epoch": 1}})
+    writer.wait()
+    assert not checkpoint_dir.exists()
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import optuna
+
+from gnn_tracking_hpo.config import auto_suggest_if_not_fixed
+
+
+def test_auto_suggest_if_not_fixed_returns_fixed_value():
+    trial = optuna.create_study().ask()
+    config = {"a": 3}
+    assert auto_suggest_if_not_fixed("a", config, trial, 1, 2) == 3
+    assert auto_suggest_if_not_fixed("b", config, trial, True) is True
+    assert config["b"] is True
+    c = auto_suggest_if_not_fixed("c", config, trial, [1, 5, 10])
+    assert auto_suggest_if_not_fixed("c", config, trial, [1, 5, 10]) == c
+    assert "c" not in config
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+import torch
+from torch_geometric.data import Batch, Data
+
+from gnn_tracking_hpo.load import PreBatchedGraphs, get_graphs_split, slice_batch
+
+
+def _get_graph(n_nodes: int, n_edges: int) -> Data:
+    return Data(
+        x=torch.rand(n_nodes, 3),
+        edge_index=torch.randint(0, n_nodes, (2, n_edges)),
+        y=torch.rand(n_edges),
+    )
+
+
+def test_slice_batch():
+    graphs = [_get_graph(n, 2 * n) for n in [3, 5, 2, 4]]
+    batch = Batch.from_data_list(graphs)
+    sliced = slice_batch(batch, 1, 3)
+    expected = Batch.from_data_list(graphs[1:3])
+    assert sliced.num_graphs == 2
+    for key in ["x", "edge_index", "y", "batch", "ptr"]:
+        assert torch.equal(sliced[key], expected[key])
+    assert torch.equal(sliced.get_example(1).x, graphs[2].x)
+
+
+def test_prebatched_graphs():
+    graphs = [_get_graph(n, 2 * n) for n in [3, 5, 2]]
+    ds = PreBatchedGraphs(graphs, batch_size=2)
+    assert len(ds) == 2
+    assert ds[0].num_graphs == 2
+    assert ds[1].num_graphs == 1
+    assert torch.equal(ds[1].edge_index, graphs[2].edge_index)
+
+
+def test_get_graphs_split(monkeypatch):
+    monkeypatch.setattr(
+        "gnn_tracking_hpo.load.get_dataset",
+        lambda dirs, stop=None, sector=None: list(range(10))[:stop],
+    )
+    splits = [
+        get_graphs_split(train_size=6, val_size=3, input_dirs=["dir"]) for _ in range(2)
+    ]
+    train, val = list(splits[0]["train"]), list(splits[0]["val"])
+    assert len(train) == 6
+    assert len(val) == 3
+    assert not set(train) & set(val)
+    assert train == list(splits[1]["train"])
+    assert val == list(splits[1]["val"])
+    with pytest.raises(ValueError):
+        get_graphs_split(train_size=8, val_size=3, input_dirs=["dir"])
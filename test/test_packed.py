@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import torch
+from torch_geometric.data import Data
+
+from gnn_tracking_hpo.packed import PackedGraphs, is_packed, pack_graphs
+
+
+def test_pack_graphs(tmp_path):
+    graphs = [
+        Data(
+            x=torch.rand(n, 3),
+            edge_index=torch.randint(0, n, (2, 2 * n)),
+            evtid=torch.tensor(n),
+        )
+        for n in [3, 5, 2]
+    ]
+    pack_graphs(graphs, tmp_path, sector=1)
+    assert is_packed(tmp_path)
+    packed = PackedGraphs(tmp_path, sector=1)
+    assert len(packed) == 3
+    for original, loaded in zip(graphs, packed):
+        for key in ["x", "edge_index", "evtid"]:
+            assert torch.equal(original[key], loaded[key])
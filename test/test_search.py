@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import pickle
+
+import optuna
+
+from gnn_tracking_hpo.search import RDBOptunaSearch
+from gnn_tracking_hpo.stoppers import OptunaPruningStopper
+
+
+def _space(trial):
+    trial.suggest_float("x", 0, 1)
+
+
+def test_rdb_optuna_search_can_be_pickled(tmp_path):
+    search = RDBOptunaSearch(_space, metric="m", mode="max", prefetch=1)
+    search._prefetch_trials()
+    assert len(search._prefetched) == 1
+    restored = pickle.loads(pickle.dumps(search))
+    assert restored._ask_executor is None
+    assert len(restored._prefetched) == 0
+    restored.suggest("a")
+    # The original keeps its prefetched trial
+    assert len(search._prefetched) == 1
+    search.save(str(tmp_path / "searcher.pkl"))
+    search.restore(str(tmp_path / "searcher.pkl"))
+    assert search.suggest("b")["x"] is not None
+
+
+def test_pruned_trials():
+    search = RDBOptunaSearch(
+        _space,
+        metric="m",
+        mode="max",
+        pruner=optuna.pruners.ThresholdPruner(lower=0.5),
+    )
+    stopper = OptunaPruningStopper(search)
+    for trial_id, value in [("bad", 0.1), ("good", 0.9)]:
+        search.suggest(trial_id)
+        search.on_trial_result(trial_id, {"m": value, "training_iteration": 1})
+    assert stopper("bad", {})
+    assert not stopper("good", {})
+    assert not stopper.stop_all()
+    search.on_trial_complete("bad", {"m": 0.1})
+    search.on_trial_complete("good", {"m": 0.9})
+    states = [t.state for t in search._ot_study.trials]
+    assert states == [
+        optuna.trial.TrialState.PRUNED,
+        optuna.trial.TrialState.COMPLETE,
+    ]
+
+
+def test_close_fails_prefetched_trials():
+    search = RDBOptunaSearch(_space, metric="m", mode="max", prefetch=1)
+    search.suggest("a")
+    search.on_trial_complete("a", {"m": 0.5})
+    assert len(search._prefetched) == 1
+    search.close()
+    states = [t.state for t in search._ot_study.trials]
+    assert states == [
+        optuna.trial.TrialState.COMPLETE,
+        optuna.trial.TrialState.FAIL,
+    ]
+
+
+def test_no_prefetch_beyond_num_samples():
+    search = RDBOptunaSearch(_space, metric="m", mode="max", prefetch=2, num_samples=2)
+    search.suggest("a")
+    search.on_trial_complete("a", {"m": 0.5})
+    assert len(search._prefetched) == 1
+    search.suggest("b")
+    search.on_trial_complete("b", {"m": 0.5})
+    assert len(search._prefetched) == 0
+    assert len(search._ot_study.trials) == 2
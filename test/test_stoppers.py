@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from gnn_tracking_hpo.stoppers import EWMANoImprovementTrialStopper
+
+
+def _run(stopper: EWMANoImprovementTrialStopper, values: list[float]) -> bool:
+    return any(
+        stopper("trial", {"m": value, "training_iteration": i + 1})
+        for i, value in enumerate(values)
+    )
+
+
+def _get_stopper(**kwargs) -> EWMANoImprovementTrialStopper:
+    return EWMANoImprovementTrialStopper(
+        "m", patience=3, mode="max", grace_period=0, **kwargs
+    )
+
+
+def test_ewma_stopper_stops_on_plateau():
+    assert _run(_get_stopper(alpha=0.5), [1.0] * 10)
+
+
+def test_ewma_stopper_continues_while_improving():
+    assert not _run(_get_stopper(alpha=0.5), [2.0**i for i in range(10)])
+
+
+def test_ewma_stopper_smoothes_metric():
+    stopper = _get_stopper(alpha=0.5)
+    _run(stopper, [0.0, 1.0])
+    assert stopper._ewma["trial"] == 0.5
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import pytest
+import wandb
+from ray.air.integrations.wandb import WandbLoggerCallback
+from ray.tune.schedulers import ASHAScheduler
+
+from gnn_tracking_hpo.tune import Dispatcher
+
+
+@pytest.fixture()
+def home(tmp_path, monkeypatch):
+    """The dispatcher writes its ID to the home directory unless in test mode"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+
+def test_get_wandb_callbacks():
+    dispatcher = Dispatcher(test=True, wandb_stats_interval=5.0)
+    callbacks = dispatcher.get_wandb_callbacks()
+    assert isinstance(callbacks[0], WandbLoggerCallback)
+    settings = callbacks[0].kwargs["settings"]
+    assert isinstance(settings, wandb.Settings)
+    # Name of the setting depends on the wandb version
+    interval = getattr(settings, "x_stats_sampling_interval", None)
+    if interval is None:
+        interval = settings._stats_sample_rate_seconds
+    assert interval == 5.0
+
+
+def test_local_dir_requires_local():
+    with pytest.raises(ValueError):
+        Dispatcher(test=True, local_dir="/tmp")
+
+
+def test_copy_results_from_local_dir(tmp_path, monkeypatch):
+    results_dir = tmp_path / "ray_results"
+    monkeypatch.setattr(
+        "gnn_tracking_hpo.tune.get_ray_results_dir", lambda: results_dir
+    )
+    dispatcher = Dispatcher(test=True, local=True, local_dir=str(tmp_path / "local"))
+    trial_dir = tmp_path / "local" / dispatcher.dname / "trial"
+    trial_dir.mkdir(parents=True)
+    (trial_dir / "result.json").write_text("{}")
+    dispatcher.copy_results_from_local_dir()
+    assert (results_dir / dispatcher.dname / "trial" / "result.json").is_file()
+
+
+def test_copy_results_from_local_dir_to_itself(tmp_path, monkeypatch):
+    monkeypatch.setattr("gnn_tracking_hpo.tune.get_ray_results_dir", lambda: tmp_path)
+    dispatcher = Dispatcher(test=True, local=True, local_dir=str(tmp_path))
+    (tmp_path / dispatcher.dname).mkdir()
+    (tmp_path / dispatcher.dname / "result.json").write_text("{}")
+    dispatcher.copy_results_from_local_dir()
+    assert (tmp_path / dispatcher.dname / "result.json").read_text() == "{}"
+
+
+def test_max_concurrent_rejected_with_hyperband():
+    with pytest.raises(ValueError):
+        Dispatcher(test=True, scheduler="hyperband", max_concurrent=2)
+    Dispatcher(test=True, scheduler="asha", max_concurrent=2)
+
+
+@pytest.mark.parametrize(
+    ("batches_per_step", "time_attr", "grace_period", "max_t"),
+    [(None, "training_iteration", 3, 100), (50, "batches_trained", 150, 5000)],
+)
+def test_get_scheduler(home, batches_per_step, time_attr, grace_period, max_t):
+    dispatcher = Dispatcher(
+        group="g", grace_period=3, max_t=100, batches_per_step=batches_per_step
+    )
+    scheduler = dispatcher.get_scheduler()
+    assert isinstance(scheduler, ASHAScheduler)
+    assert scheduler._time_attr == time_attr
+    assert scheduler._max_t == max_t
+    milestones = [milestone for milestone, _ in scheduler._brackets[0]._rungs]
+    assert min(milestones) == grace_period
+
+
+@pytest.mark.parametrize(
+    ("cpu", "gpus_per_trial", "expected"),
+    [
+        (True, 1.0, {"cpu": 1, "gpu": 0}),
+        (False, 1.0, {"cpu": 1, "gpu": 1.0}),
+        (False, 0.5, {"cpu": 1, "gpu": 0.5}),
+    ],
+)
+def test_get_trial_resources(monkeypatch, cpu, gpus_per_trial, expected):
+    # The dispatcher sets GNN_TRACKING_DEVICE with cpu=True, undo this afterwards
+    monkeypatch.delenv("GNN_TRACKING_DEVICE", raising=False)
+    dispatcher = Dispatcher(test=True, cpu=cpu, gpus_per_trial=gpus_per_trial)
+    assert dispatcher.get_trial_resources() == expected
+
+
+@pytest.mark.parametrize(
+    ("gpus_per_trial", "expected"),
+    [(1.0, {"cpu": 6, "gpu": 1.0}), (0.5, {"cpu": 3, "gpu": 0.5})],
+)
+def test_get_trial_resources_shares_cpus(home, gpus_per_trial, expected):
+    dispatcher = Dispatcher(group="g", gpus_per_trial=gpus_per_trial)
+    assert dispatcher.get_trial_resources() == expected
+
+
+def test_get_optuna_storage(home, tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    assert Dispatcher(test=True).get_optuna_storage() is None
+    assert (
+        Dispatcher(test=True, optuna_storage="sqlite:///a.db").get_optuna_storage()
+        == "sqlite:///a.db"
+    )
+    dispatcher = Dispatcher(group="g")
+    storage = dispatcher.get_optuna_storage()
+    assert storage == f"sqlite:///{tmp_path}/g_{dispatcher.id}.db"